@@ -5,8 +5,12 @@ from utils import BaseService
 
 
 class CarService(BaseService):
-    def __init__(self, root_directory_path: str) -> None:
-        super().__init__(root_directory_path)
+    model_classes = (Model, Car, Sale)
+
+    def __init__(
+        self, root_directory_path: str, sorted_index: bool = False
+    ) -> None:
+        super().__init__(root_directory_path, sorted_index)
 
     # Задание 1. Сохранение автомобилей и моделей
     def add_model(self, model: Model) -> Model:
@@ -19,24 +23,28 @@ class CarService(BaseService):
     # Задание 2. Сохранение продаж.
     def sell_car(self, sale: Sale) -> Car:
         self.save(sale)
-        return self.update(sale.car_vin, {"status": CarStatus.sold}, Car)
+        return self._set_status(sale.car_vin, CarStatus.sold)
 
     # Задание 3. Доступные к продаже
     def get_cars(self, status: CarStatus) -> list[Car]:
-        return [car for car in self.get_list(Car) if car.status == status]
+        return [
+            car
+            for car in self.iter_objects(Car)
+            if car.status == status and not car.is_deleted
+        ]
 
     # Задание 4. Детальная информация
     def get_car_info(self, vin: str) -> CarFullInfo | None:
-        car = self.get(vin, Car)
+        res = self._bulk_get({Car: [vin], Sale: [vin]})
+        car = res.get((Car, vin))
         if not car:
             return None
 
-        model = self.get(str(car.model), Model) if car else None
+        model = self.get(str(car.model), Model)
         if not model:
             return None
 
-        sale = self.get(vin, Sale) if car else None
-        return CarFullInfo.from_join(car, model, sale)
+        return CarFullInfo.from_join(car, model, res.get((Sale, vin)))
 
     # Задание 5. Обновление ключевого поля
     def update_vin(self, vin: str, new_vin: str) -> Car:
@@ -50,29 +58,44 @@ class CarService(BaseService):
             return None
 
         if self.delete(vin, Sale):
-            car = self.update(
-                sale.car_vin, {"status": CarStatus.available}, Car
-            )
-            return car
+            return self._set_status(sale.car_vin, CarStatus.available)
         return None
 
+    def _set_status(self, vin: str, status: CarStatus) -> Car:
+        """Меняет статус автомобиля, перезаписывая только байт статуса."""
+        num_line = self._patch_field(
+            vin, Car, Car._STATUS_OFFSET, Car.pack_status(status)
+        )
+        return self.get_object_by_num_line(num_line, Car)
+
     # Задание 7. Самые продаваемые модели
     def top_models_by_sales(self) -> list[ModelSaleStats]:
-        sales = self.get_list(Sale)
-        model_sales_counter = Counter()
-
-        for sale in sales:
-            car = self.get(str(sale.car_vin), Car)
-            model_sales_counter[car.model] += 1
-
-        top_models = model_sales_counter.most_common(3)
-        top_model_stats = [
-            ModelSaleStats(
-                car_model_name=self.get(str(model_id), Model).name,
-                brand=self.get(str(model_id), Model).brand,
-                sales_number=sales_number,
-            )
-            for model_id, sales_number in top_models
+        car_models = {
+            car.vin: car.model
+            for car in self.iter_objects(Car)
+            if not car.is_deleted
+        }
+        model_sales_counter = Counter(
+            car_models[sale.car_vin]
+            for sale in self.iter_objects(Sale)
+            if not sale.is_deleted and sale.car_vin in car_models
+        )
+
+        top_models = [
+            (str(model_id), sales_number)
+            for model_id, sales_number in model_sales_counter.most_common(3)
         ]
+        models = self._bulk_get({Model: [mid for mid, _ in top_models]})
+
+        top_model_stats = []
+        for mid, sales_number in top_models:
+            model = models[(Model, mid)]
+            top_model_stats.append(
+                ModelSaleStats(
+                    car_model_name=model.name,
+                    brand=model.brand,
+                    sales_number=sales_number,
+                )
+            )
 
         return top_model_stats
@@ -1,16 +1,113 @@
-from datetime import datetime
+import csv
+import io
+import struct
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime, timedelta
 from decimal import Decimal
 from enum import StrEnum
+from typing import ClassVar
 
-from pydantic import BaseModel
+_CSV_SPECIAL = frozenset(',"\r\n')
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
 
 
-class BaseModel(BaseModel):
+def join_row(*fields) -> str:
+    """
+    Собирает строку с разделителями запятыми из значений полей.
+
+    Поля, содержащие запятые, кавычки или переводы строк, экранируются по
+    правилам CSV.
+    """
+    values = [str(value) for value in fields]
+    if not any(_CSV_SPECIAL.intersection(value) for value in values):
+        return ",".join(values)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def split_row(data: str, size: int) -> list[str]:
+    """
+    Разбирает строку, собранную `join_row`, отбрасывая выравнивающие
+    пробелы в конце.
+    """
+    data = data.rstrip()
+    if '"' in data:
+        return next(csv.reader((data,)))
+    return data.split(",", size - 1)
+
+
+def pack_str(value: str, size: int) -> bytes:
+    """
+    Кодирует строку для поля фиксированной длины.
+
+    Исключения:
+        ValueError: Если строка не помещается в поле.
+    """
+    data = value.encode()
+    if len(data) > size:
+        raise ValueError(f"Значение длиннее {size} байт: {value}")
+    return data
+
+
+def unpack_str(data: bytes) -> str:
+    """Декодирует строку из поля фиксированной длины."""
+    return data.rstrip(b"\0").decode()
+
+
+def to_cents(value: Decimal) -> int:
+    """
+    Переводит денежную сумму в целое число копеек.
+
+    Исключения:
+        ValueError: Если у суммы больше двух знаков после запятой.
+    """
+    cents = value.scaleb(2)
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Сумма точнее копеек: {value}")
+    return int(cents)
+
+
+def from_cents(value: int) -> Decimal:
+    """Переводит целое число копеек в денежную сумму."""
+    return Decimal(value).scaleb(-2)
+
+
+def to_timestamp(value: datetime) -> int:
+    """
+    Переводит дату в микросекунды от начала эпохи. Дата с часовым поясом
+    приводится к UTC, поэтому читается обратно как дата UTC без пояса.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(UTC).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_timestamp(value: int) -> datetime:
+    """Переводит микросекунды от начала эпохи в дату без часового пояса."""
+    return _EPOCH + timedelta(microseconds=value)
+
+
+@dataclass(slots=True)
+class BaseModel:
     """
     Базовый класс модели с общим полем `is_deleted`, которое указывает,
     удален ли объект.
     """
-    is_deleted: bool = False
+    is_deleted: bool = field(default=False, kw_only=True)
+
+    def model_copy(self, update: dict | None = None) -> "BaseModel":
+        """
+        Возвращает копию объекта с обновленными полями.
+
+        Аргументы:
+            update (dict | None): Новые значения полей.
+
+        Возвращает:
+            BaseModel: Копия объекта.
+        """
+        return replace(self, **(update or {}))
 
 
 class CarStatus(StrEnum):
@@ -35,6 +132,12 @@ class CarStatus(StrEnum):
         return self.value
 
 
+_STATUS_MAP = {status.value: status for status in CarStatus}
+_STATUSES = tuple(CarStatus)
+_STATUS_INDEX = {status: i for i, status in enumerate(_STATUSES)}
+
+
+@dataclass(slots=True)
 class Car(BaseModel):
     """
     Модель автомобиля с такими атрибутами, как vin, модель, цена, дата начала
@@ -53,6 +156,12 @@ class Car(BaseModel):
     date_start: datetime
     status: CarStatus
 
+    # vin, модель, цена в копейках, дата начала в микросекундах, статус,
+    # признак удаления.
+    _FMT: ClassVar[struct.Struct] = struct.Struct("<17sIqqB?")
+    # Смещение байта статуса внутри записи.
+    _STATUS_OFFSET: ClassVar[int] = struct.calcsize("<17sIqq")
+
     def index(self) -> str:
         """
         Возвращает уникальный идентификатор автомобиля (VIN) для индексации.
@@ -69,12 +178,13 @@ class Car(BaseModel):
         Возвращает:
             str: Строка, разделенная запятыми, представляющая атрибуты автомобиля.
         """
-        return (
-            f"{self.vin},"
-            f"{self.model},"
-            f"{self.price},"
-            f"{self.date_start.isoformat()},"
-            f"{self.status}")
+        return join_row(
+            self.vin,
+            self.model,
+            self.price,
+            self.date_start.isoformat(),
+            self.status,
+        )
 
     @classmethod
     def from_str(cls, data: str) -> "Car":
@@ -91,18 +201,73 @@ class Car(BaseModel):
         Исключения:
             ValueError: Если строка не имеет правильного формата.
         """
-        parts = data.strip().split(",")
-        if len(parts) != 5:
+        parts = split_row(data, 5)
+        if len(parts) != 5 or parts[4] not in _STATUS_MAP:
             raise ValueError(f"Неверный формат автомобиля: {data}")
         return cls(
             vin=parts[0],
-            model=parts[1],
+            model=int(parts[1]),
             price=Decimal(parts[2]),
             date_start=datetime.fromisoformat(parts[3]),
-            status=CarStatus(parts[4]),
+            status=_STATUS_MAP[parts[4]],
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Упаковывает автомобиль в запись фиксированной длины.
+
+        Возвращает:
+            bytes: Запись длиной `Car._FMT.size` байт.
+        """
+        return self._FMT.pack(
+            pack_str(self.vin, 17),
+            self.model,
+            to_cents(self.price),
+            to_timestamp(self.date_start),
+            _STATUS_INDEX[self.status],
+            self.is_deleted,
         )
 
+    @staticmethod
+    def pack_status(status: CarStatus) -> bytes:
+        """
+        Упаковывает статус в байт, хранящийся по смещению `_STATUS_OFFSET`.
+
+        Аргументы:
+            status (CarStatus): Статус автомобиля.
+
+        Возвращает:
+            bytes: Один байт статуса.
+        """
+        return bytes((_STATUS_INDEX[status],))
 
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Car":
+        """
+        Распаковывает автомобиль из записи фиксированной длины.
+
+        Аргументы:
+            data (bytes): Запись, созданная `to_bytes`.
+
+        Возвращает:
+            Car: Экземпляр автомобиля.
+        """
+        return cls._from_fields(cls._FMT.unpack(data))
+
+    @classmethod
+    def _from_fields(cls, fields: tuple) -> "Car":
+        vin, model, price, date_start, status, is_deleted = fields
+        return cls(
+            vin=unpack_str(vin),
+            model=model,
+            price=from_cents(price),
+            date_start=from_timestamp(date_start),
+            status=_STATUSES[status],
+            is_deleted=is_deleted,
+        )
+
+
+@dataclass(slots=True)
 class Model(BaseModel):
     """
     Модель автомобиля с атрибутами id, name и brand.
@@ -116,6 +281,9 @@ class Model(BaseModel):
     name: str
     brand: str
 
+    # id, название, бренд, признак удаления.
+    _FMT: ClassVar[struct.Struct] = struct.Struct("<I64s64s?")
+
     def index(self) -> str:
         """
         Возвращает уникальный идентификатор модели для индексации.
@@ -132,7 +300,7 @@ class Model(BaseModel):
         Возвращает:
             str: Строка, разделенная запятыми, представляющая атрибуты модели.
         """
-        return f"{self.id},{self.name},{self.brand}"
+        return join_row(self.id, self.name, self.brand)
 
     @classmethod
     def from_str(cls, data: str) -> "Model":
@@ -149,12 +317,50 @@ class Model(BaseModel):
         Исключения:
             ValueError: Если строка не имеет правильного формата.
         """
-        parts = data.strip().split(",")
+        parts = split_row(data, 3)
         if len(parts) != 3:
             raise ValueError("Неверный формат модели")
         return cls(id=int(parts[0]), name=parts[1], brand=parts[2])
 
+    def to_bytes(self) -> bytes:
+        """
+        Упаковывает модель в запись фиксированной длины.
 
+        Возвращает:
+            bytes: Запись длиной `Model._FMT.size` байт.
+        """
+        return self._FMT.pack(
+            self.id,
+            pack_str(self.name, 64),
+            pack_str(self.brand, 64),
+            self.is_deleted,
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Model":
+        """
+        Распаковывает модель из записи фиксированной длины.
+
+        Аргументы:
+            data (bytes): Запись, созданная `to_bytes`.
+
+        Возвращает:
+            Model: Экземпляр модели.
+        """
+        return cls._from_fields(cls._FMT.unpack(data))
+
+    @classmethod
+    def _from_fields(cls, fields: tuple) -> "Model":
+        id, name, brand, is_deleted = fields
+        return cls(
+            id=id,
+            name=unpack_str(name),
+            brand=unpack_str(brand),
+            is_deleted=is_deleted,
+        )
+
+
+@dataclass(slots=True)
 class Sale(BaseModel):
     """
     Модель продажи автомобиля с атрибутами, такими как номер продажи, VIN
@@ -171,6 +377,10 @@ class Sale(BaseModel):
     sales_date: datetime
     cost: Decimal
 
+    # Номер продажи, VIN, дата продажи в микросекундах, стоимость в
+    # копейках, признак удаления.
+    _FMT: ClassVar[struct.Struct] = struct.Struct("<32s17sqq?")
+
     def index(self) -> str:
         """
         Возвращает VIN автомобиля для индексации.
@@ -187,8 +397,8 @@ class Sale(BaseModel):
         Возвращает:
             str: Строка, разделенная запятыми, представляющая атрибуты продажи.
         """
-        return (
-            f"{self.sales_number},{self.car_vin},{self.sales_date},{self.cost}"
+        return join_row(
+            self.sales_number, self.car_vin, self.sales_date, self.cost
         )
 
     @classmethod
@@ -206,7 +416,7 @@ class Sale(BaseModel):
         Исключения:
             ValueError: Если строка не имеет правильного формата.
         """
-        parts = data.strip().split(",")
+        parts = split_row(data, 4)
         if len(parts) != 4:
             raise ValueError("Неверный формат продажи")
         return cls(
@@ -216,7 +426,47 @@ class Sale(BaseModel):
             cost=Decimal(parts[3]),
         )
 
+    def to_bytes(self) -> bytes:
+        """
+        Упаковывает продажу в запись фиксированной длины.
+
+        Возвращает:
+            bytes: Запись длиной `Sale._FMT.size` байт.
+        """
+        return self._FMT.pack(
+            pack_str(self.sales_number, 32),
+            pack_str(self.car_vin, 17),
+            to_timestamp(self.sales_date),
+            to_cents(self.cost),
+            self.is_deleted,
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Sale":
+        """
+        Распаковывает продажу из записи фиксированной длины.
+
+        Аргументы:
+            data (bytes): Запись, созданная `to_bytes`.
+
+        Возвращает:
+            Sale: Экземпляр продажи.
+        """
+        return cls._from_fields(cls._FMT.unpack(data))
+
+    @classmethod
+    def _from_fields(cls, fields: tuple) -> "Sale":
+        sales_number, car_vin, sales_date, cost, is_deleted = fields
+        return cls(
+            sales_number=unpack_str(sales_number),
+            car_vin=unpack_str(car_vin),
+            sales_date=from_timestamp(sales_date),
+            cost=from_cents(cost),
+            is_deleted=is_deleted,
+        )
+
 
+@dataclass(slots=True)
 class CarFullInfo(BaseModel):
     """
     Полная информация об автомобиле, включая данные о модели, статусе, цене,
@@ -269,6 +519,7 @@ class CarFullInfo(BaseModel):
         )
 
 
+@dataclass(slots=True)
 class ModelSaleStats(BaseModel):
     """
     Статистика продаж по модели автомобиля.
@@ -295,7 +546,7 @@ class ModelSaleStats(BaseModel):
         Возвращает:
             ModelSaleStats: Экземпляр статистики продаж модели.
         """
-        parts = data.strip().split(",")
+        parts = split_row(data, 3)
         if len(parts) != 3:
             raise ValueError("Неверный формат статистики продаж")
         return cls(
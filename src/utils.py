@@ -1,71 +1,261 @@
+import mmap
 import os
-from functools import wraps
-from typing import Type, Union, List
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Iterator, List, Type, Union
 import inflect
-from pydantic import BaseModel
 
-LINE_SIZE = 500
-p = inflect.engine()
-
-
-def write_tracker(func):
-    """Декоратор для отслеживания изменений размера файла после записи."""
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        file_path = args[1] if len(args) > 1 else None
-        if not file_path:
-            raise ValueError("Database path is required.")
-
-        if not os.path.isfile(file_path):
-            open(file_path, "w").close()
-
-        try:
-            old_size = os.path.getsize(file_path)
-            func(*args, **kwargs)
-            new_size = os.path.getsize(file_path)
-
-            if new_size == old_size:
-                raise IOError("Запись не произведена")
-
-            return new_size // LINE_SIZE
-        except Exception as e:
-            raise RuntimeError(
-                f"Ошибка при обработке файла '{file_path}': {e}"
-            )
-
-    return wrapper
-
-
-@write_tracker
-def append(prepared_data: str, file_path: str) -> int:
-    """Добавляет строку данных в файл."""
-    with open(file_path, "a") as file:
-        file.write(prepared_data)
+from models import BaseModel, pack_str
 
+# Запись индекса: ключ объекта и номер строки в файле модели.
+INDEX_KEY_SIZE = 17
+INDEX_FMT = struct.Struct(f"<{INDEX_KEY_SIZE}sI")
+p = inflect.engine()
 
-def get_prepared_data(data: str, line_size=LINE_SIZE) -> str:
-    """Подготавливает строку к записи, дополняя пробелами."""
-    return f"{data.ljust(line_size - 2)}\n"
 
+def pack_index(key: str, line_in_db: int) -> bytes:
+    """Упаковывает запись индекса."""
+    return INDEX_FMT.pack(pack_str(key, INDEX_KEY_SIZE), line_in_db)
+
+
+@lru_cache(maxsize=16)
+def _paths_for(cls: type, root: str) -> tuple[str, str]:
+    """Возвращает пути к файлам модели и индексов для класса."""
+    name = p.plural(cls.__name__).lower()
+    return (
+        os.path.join(root, f"{name}.bin"),
+        os.path.join(root, f"{name}_index.bin"),
+    )
+
+
+class SortedIndex:
+    """
+    Компактный индекс: отсортированные ключи фиксированной длины, склеенные
+    в одну строку байт, и параллельные массивы номеров строк. Поиск идет
+    двоичным поиском. Новые и переименованные ключи хранятся в небольшом
+    словаре до перестроения индекса.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        """
+        Строит индекс по содержимому файла индексов. Файл, отсортированный
+        `compact`, читается за один проход без сортировки.
+        """
+        size = INDEX_FMT.size
+        count = len(data) // size
+
+        def key(i: int) -> bytes:
+            return data[i * size:i * size + INDEX_KEY_SIZE]
+
+        order = range(count)
+        if any(key(i) > key(i + 1) for i in range(count - 1)):
+            # Сортировка устойчива, поэтому повторы ключа идут по порядку
+            # записи.
+            order = sorted(order, key=key)
+
+        self._keys = bytearray()
+        self._lines_in_db = array("I")
+        self._lines_in_index = array("I")
+        for pos, i in enumerate(order):
+            # Для повторяющихся ключей остается последняя запись, как в
+            # словаре, а ключи с надгробием пропускаются.
+            if pos + 1 < count and key(order[pos + 1]) == key(i):
+                continue
+            line_in_db = INDEX_FMT.unpack_from(data, i * size)[1]
+            if line_in_db:
+                self._keys += key(i)
+                self._lines_in_db.append(line_in_db)
+                self._lines_in_index.append(i + 1)
+        self._overflow: dict[str, tuple[int, int]] = {}
+
+    def _find(self, key: str) -> int:
+        """Возвращает позицию живого ключа в массивах или -1."""
+        data = key.encode()
+        if len(data) > INDEX_KEY_SIZE:
+            return -1
+        data = data.ljust(INDEX_KEY_SIZE, b"\0")
+
+        lo, hi = 0, len(self._lines_in_db)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = mid * INDEX_KEY_SIZE
+            if self._keys[offset:offset + INDEX_KEY_SIZE] < data:
+                lo = mid + 1
+            else:
+                hi = mid
+        offset = lo * INDEX_KEY_SIZE
+        if (
+            lo < len(self._lines_in_db)
+            and self._keys[offset:offset + INDEX_KEY_SIZE] == data
+            and self._lines_in_db[lo]
+        ):
+            return lo
+        return -1
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._overflow or self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> tuple[int, int]:
+        if key in self._overflow:
+            return self._overflow[key]
+        pos = self._find(key)
+        if pos < 0:
+            raise KeyError(key)
+        return self._lines_in_db[pos], self._lines_in_index[pos]
+
+    def __setitem__(self, key: str, value: tuple[int, int]) -> None:
+        self._overflow[key] = value
+
+    def pop(self, key: str) -> tuple[int, int]:
+        """Удаляет ключ из индекса и возвращает его значение."""
+        value = self[key]
+        self._overflow.pop(key, None)
+        pos = self._find(key)
+        if pos >= 0:
+            # Номер строки 0 помечает удаленный ключ.
+            self._lines_in_db[pos] = 0
+        return value
 
-def sort_data(data: List[str]) -> List[str]:
-    """Сортирует строки по первому элементу."""
-    if not data:
-        raise ValueError("Input data cannot be None or empty.")
-    return sorted(data, key=lambda x: x.split(",")[0])
 
+class BaseService:
+    """
+    Хранилище объектов в файлах с записями фиксированной длины.
 
-def data_to_dict(data: List[str]) -> dict:
-    """Преобразует список строк в словарь."""
-    if not data:
-        raise ValueError("Input data cannot be None or empty.")
-    return {k: v for k, v in (item.split(",") for item in data)}
+    Номера строк новых записей берутся из позиции конца файла, поэтому
+    несколько сервисов могут дописывать в один каталог. Кеш индексов при
+    этом не видит чужих изменений, а блок `bulk` рассчитывает на то, что
+    пока он открыт, в его файлы больше никто не пишет.
+    """
 
+    # Классы моделей, файлы которых создаются при инициализации сервиса.
+    model_classes: tuple[Type[BaseModel], ...] = ()
 
-class BaseService:
-    def __init__(self, root_directory_path: str) -> None:
+    def __init__(
+        self, root_directory_path: str, sorted_index: bool = False
+    ) -> None:
         self.root_directory_path = root_directory_path
+        # Хранить индексы в `SortedIndex` вместо словаря, экономя память на
+        # больших таблицах ценой двоичного поиска.
+        self.sorted_index = sorted_index
+        self._index_cache: dict[
+            type, dict[str, tuple[int, int]] | SortedIndex
+        ] = {}
+        self._index_dirty: set[type] = set()
+        self._mm: dict[str, mmap.mmap] = {}
+        self._bulk_buffers: defaultdict[str, list[bytes]] | None = None
+        self._file_sizes: dict[str, int] = {}
+        self._fh: dict[str, BinaryIO] = {}
+
+        for cls in self.model_classes:
+            for file_path in _paths_for(cls, root_directory_path):
+                self._file(file_path)
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрывает файлы, открытые на добавление, и их отображения."""
+        for mm in self._mm.values():
+            mm.close()
+        self._mm.clear()
+        for file in self._fh.values():
+            file.close()
+        self._fh.clear()
+
+    def _file(self, file_path: str) -> BinaryIO:
+        """Возвращает открытый на добавление файл, создавая его при нужде."""
+        file = self._fh.get(file_path)
+        if file is None:
+            file = self._fh[file_path] = open(file_path, "ab", buffering=0)
+            self._file_sizes[file_path] = os.fstat(file.fileno()).st_size
+        return file
+
+    def _mmap(self, file_path: str, size: int) -> mmap.mmap:
+        """Возвращает отображение файла не меньше `size` байт."""
+        mm = self._mm.get(file_path)
+        if mm is not None and len(mm) >= size:
+            return mm
+
+        fd = os.open(file_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            if os.fstat(fd).st_size < size:
+                raise IndexError(f"Line is out of range: {file_path}")
+            if mm is not None:
+                mm.close()
+            mm = self._mm[file_path] = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        return mm
+
+    @contextmanager
+    def bulk(self):
+        """
+        Буферизует добавляемые записи и сбрасывает их на диск при выходе,
+        открывая каждый файл один раз.
+
+        Добавленные внутри блока объекты можно читать и обновлять по ключу,
+        но в `iter_objects` и `get_list` они попадут только после выхода из
+        блока. При исключении отбрасываются только добавленные записи:
+        изменения объектов, сохраненных до начала блока, записываются на
+        диск сразу и остаются.
+        """
+        if self._bulk_buffers is not None:
+            yield self
+            return
+
+        self._bulk_buffers = defaultdict(list)
+        try:
+            yield self
+        except BaseException:
+            self._bulk_buffers = None
+            for file_path, file in self._fh.items():
+                self._file_sizes[file_path] = os.fstat(file.fileno()).st_size
+            self._index_cache.clear()
+            self._index_dirty.clear()
+            raise
+
+        buffers, self._bulk_buffers = self._bulk_buffers, None
+        for file_path, buffer in buffers.items():
+            self._file(file_path).write(b"".join(buffer))
+
+    def compact(self, *classes: Type[BaseModel]) -> None:
+        """
+        Сортирует индексные файлы переданных классов, а без аргументов -
+        всех классов, индексы которых менялись.
+
+        Поиск по индексу не зависит от порядка строк в файле, поэтому
+        сортировка нужна только внешним потребителям индексных файлов.
+
+        Исключения:
+            RuntimeError: Если вызван внутри блока `bulk`.
+        """
+        for cls in classes or list(self._index_dirty):
+            self.refresh(cls)
+
+    def _append_and_count(
+        self, file_path: str, record: bytes, buffered: bool = True
+    ) -> int:
+        """
+        Добавляет запись в файл или в буфер, если активен `bulk` и
+        `buffered` истинно, и возвращает ее номер.
+        """
+        if not record:
+            raise IOError("Запись не произведена")
+
+        file = self._file(file_path)
+        if buffered and self._bulk_buffers is not None:
+            self._bulk_buffers[file_path].append(record)
+            self._file_sizes[file_path] += len(record)
+        else:
+            # Файл открыт в режиме добавления, поэтому позиция после записи
+            # - конец файла с учетом записей других сервисов.
+            file.write(record)
+            self._file_sizes[file_path] = file.tell()
+        return self._file_sizes[file_path] // len(record)
 
     def _handle_append_result(
         self, result: int, instance: BaseModel, action="save"
@@ -76,24 +266,41 @@ class BaseService:
                 f"{action.capitalize()} object [{str(instance)}] successfully."
             )
             if action == "index":
-                self.refresh(instance)
+                self._index_dirty.add(instance.__class__)
             return result
         raise IOError(f"Failed to process {action} [{str(instance)}].")
 
     def index(self, instance: BaseModel, line_in_db: int):
         """Добавляет объект в индекс."""
         index_db_path = self._get_index_db_path(instance)
-        data = get_prepared_data(f"{instance.index()},{line_in_db}")
-        return self._handle_append_result(
-            append(data, index_db_path), instance, action="index"
-        )
+        data = pack_index(instance.index(), line_in_db)
+        cls = instance.__class__
+        if self._bulk_buffers is not None:
+            self._load_index(cls)
+        try:
+            result = self._handle_append_result(
+                self._append_and_count(index_db_path, data),
+                instance,
+                action="index",
+            )
+        except Exception:
+            self._index_cache.pop(cls, None)
+            raise
+        if cls in self._index_cache:
+            self._index_cache[cls][sys.intern(instance.index())] = (
+                line_in_db,
+                result,
+            )
+        return result
 
     def save(self, instance: BaseModel) -> BaseModel:
         """Сохраняет объект в базу данных."""
         db_path = self._get_model_db_path(instance)
-        data = get_prepared_data(str(instance))
+        data = instance.to_bytes()
 
-        id = self._handle_append_result(append(data, db_path), instance)
+        id = self._handle_append_result(
+            self._append_and_count(db_path, data), instance
+        )
         if self.index(instance=instance, line_in_db=id):
             return instance
 
@@ -125,53 +332,125 @@ class BaseService:
     def update_index(
         self, old_index: str, new_index: str, cls: Type[BaseModel]
     ) -> None:
-        """Обновляет индекс объекта."""
+        """
+        Обновляет индекс объекта, дописывая в файл индексов запись-надгробие
+        для старого ключа и запись для нового. При чтении файла побеждает
+        последняя запись ключа, а номер строки 0 означает удаленный ключ.
+        """
+        data = self._load_index(cls)
+        if old_index not in data:
+            return
+
+        line_in_db, _ = data.pop(old_index)
         index_db_path = self._get_index_db_path(cls)
-        with open(index_db_path, "r+") as file:
-            data = data_to_dict(file.readlines())
-
-            if old_index in data:
-                data[new_index] = data.pop(old_index)
-
-            file.seek(0)
-            file.truncate()
-            for k, v in data.items():
-                file.write(f"{k},{v}")
-            file.flush()
+        # Индекс объекта, уже записанного на диск, меняется сразу, как и сам
+        # объект, чтобы откат `bulk` не разводил их.
+        buffered = (
+            self._buffered_position(
+                self._get_model_db_path(cls), line_in_db, cls._FMT.size
+            )
+            is not None
+        )
+        try:
+            self._append_and_count(
+                index_db_path, pack_index(old_index, 0), buffered
+            )
+            line_in_index = self._append_and_count(
+                index_db_path, pack_index(new_index, line_in_db), buffered
+            )
+        except Exception:
+            self._index_cache.pop(cls, None)
+            raise
+        data[sys.intern(new_index)] = (line_in_db, line_in_index)
+        self._index_dirty.add(cls)
 
-    def refresh(self, instance: BaseModel) -> int:
+    def refresh(
+        self, instance_or_cls: Union[BaseModel, Type[BaseModel]]
+    ) -> int:
         """Пересортировывает индексный файл."""
-        db_index_path = self._get_index_db_path(instance)
+        if self._bulk_buffers is not None:
+            raise RuntimeError("Index can not be sorted inside bulk().")
+        cls = (
+            instance_or_cls
+            if isinstance(instance_or_cls, type)
+            else instance_or_cls.__class__
+        )
+        db_index_path = self._get_index_db_path(cls)
+        self._index_dirty.discard(cls)
+        self._index_cache.pop(cls, None)
+        size = INDEX_FMT.size
         try:
-            with open(db_index_path, "r+") as file:
-                sorted_data = sort_data(file.readlines())
+            with open(db_index_path, "r+b") as file:
+                data = file.read()
+                # Сортировка только по ключу устойчива: среди повторов
+                # ключа последней остается самая свежая запись.
+                records = sorted(
+                    (
+                        data[offset:offset + size]
+                        for offset in range(0, len(data), size)
+                    ),
+                    key=lambda record: record[:INDEX_KEY_SIZE],
+                )
                 file.seek(0)
-                file.writelines(sorted_data)
-                file.flush()
-            return len(sorted_data)
+                file.write(b"".join(records))
+            return len(records)
         except Exception as e:
             raise RuntimeError(
                 f"Error processing file {db_index_path}: {str(e)}"
             )
 
+    def _load_index(
+        self, cls: Type[BaseModel]
+    ) -> dict[str, tuple[int, int]] | SortedIndex:
+        """
+        Возвращает индекс класса, при первом обращении читая его с диска.
+
+        Значение индекса - пара из номера строки в файле модели и номера
+        строки в файле индексов.
+        """
+        cache = self._index_cache.get(cls)
+        if cache is None:
+            data = b""
+            index_db_path = self._get_index_db_path(cls)
+            if os.path.isfile(index_db_path):
+                with open(index_db_path, "rb") as file:
+                    data = file.read()
+            if self.sorted_index:
+                cache = SortedIndex(data)
+            else:
+                records = INDEX_FMT.iter_unpack(data)
+                cache = {
+                    sys.intern(key.rstrip(b"\0").decode()): (
+                        line_in_db,
+                        line_in_index,
+                    )
+                    for line_in_index, (key, line_in_db) in enumerate(
+                        records, 1
+                    )
+                }
+                # Ключи, последняя запись которых - надгробие, удалены.
+                for key in [k for k, v in cache.items() if not v[0]]:
+                    del cache[key]
+            self._index_cache[cls] = cache
+        return cache
+
     def get_num_line(self, index: str, cls: Type[BaseModel]) -> int:
         """Получает номер строки в файле по индексу."""
-        index_db_path = self._get_index_db_path(cls)
-        with open(index_db_path, "r") as file:
-            prepared_data = data_to_dict(file.readlines())
-
+        prepared_data = self._load_index(cls)
         if index not in prepared_data:
             raise KeyError(f"{index} does not exist.")
 
-        return int(prepared_data[index])
+        return prepared_data[index][0]
 
     def get_object_by_num_line(
         self, num_line: int, cls: Type[BaseModel]
     ) -> BaseModel:
         """Получает объект из файла по номеру строки."""
-        with open(self._get_model_db_path(cls), "r") as file:
-            file.seek((num_line - 1) * LINE_SIZE if num_line > 1 else 0)
-            return cls.from_str(file.readline().strip())
+        return cls.from_bytes(
+            self._read_record(
+                self._get_model_db_path(cls), num_line, cls._FMT.size
+            )
+        )
 
     def get(self, index: str, cls: Type[BaseModel]) -> BaseModel:
         """Получает объект по индексу."""
@@ -183,10 +462,36 @@ class BaseService:
             print(e)
             return None
 
+    def iter_objects(self, cls: Type[BaseModel]) -> Iterator[BaseModel]:
+        """Последовательно читает объекты из файла."""
+        chunk_size = cls._FMT.size * 4096
+        with open(self._get_model_db_path(cls), "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield from map(cls._from_fields, cls._FMT.iter_unpack(chunk))
+
+    def _bulk_get(
+        self, keys_by_cls: dict[Type[BaseModel], List[str]]
+    ) -> dict[tuple[Type[BaseModel], str], BaseModel]:
+        """
+        Получает несколько объектов разных классов, читая строки каждого
+        файла в порядке их расположения. Отсутствующие и удаленные объекты
+        в результат не попадают.
+        """
+        result = {}
+        for cls, keys in keys_by_cls.items():
+            index = self._load_index(cls)
+            lines = sorted(
+                (index[key][0], key) for key in keys if key in index
+            )
+            for num_line, key in lines:
+                instance = self.get_object_by_num_line(num_line, cls)
+                if not instance.is_deleted:
+                    result[(cls, key)] = instance
+        return result
+
     def get_list(self, cls: Type[BaseModel]) -> List[BaseModel]:
         """Получает список всех объектов из файла."""
-        with open(self._get_model_db_path(cls), "r") as file:
-            return [cls.from_str(line.strip()) for line in file]
+        return list(self.iter_objects(cls))
 
     def delete(self, index: str, cls: Type[BaseModel]):
         """Помечает объект как удаленный."""
@@ -196,10 +501,89 @@ class BaseService:
         self, file_path: str, num_line: int, new_instance: BaseModel
     ):
         """Перезаписывает строку в файле."""
-        with open(file_path, "r+") as file:
-            file.seek((num_line - 1) * LINE_SIZE)
-            file.write(get_prepared_data(str(new_instance)))
-            file.flush()
+        self._write_record(file_path, num_line, new_instance.to_bytes())
+
+    def _buffered_position(
+        self, file_path: str, num_line: int, size: int
+    ) -> int | None:
+        """
+        Возвращает позицию записи в буфере `bulk` или None, если запись уже
+        на диске.
+        """
+        if self._bulk_buffers is None:
+            return None
+        buffer = self._bulk_buffers.get(file_path)
+        if not buffer:
+            return None
+        first_buffered = self._file_sizes[file_path] // size - len(buffer)
+        if num_line <= first_buffered:
+            return None
+        return num_line - first_buffered - 1
+
+    def _read_record(self, file_path: str, num_line: int, size: int) -> bytes:
+        """Читает запись по номеру строки, в том числе из буфера `bulk`."""
+        buffered = self._buffered_position(file_path, num_line, size)
+        if buffered is not None:
+            return self._bulk_buffers[file_path][buffered]
+
+        offset = (num_line - 1) * size
+        mm = self._mmap(file_path, offset + size)
+        return mm[offset:offset + size]
+
+    def _write_record(self, file_path: str, num_line: int, record: bytes):
+        """
+        Записывает запись в строку файла с заданным номером. Запись, еще не
+        сброшенная на диск блоком `bulk`, заменяется в буфере.
+        """
+        self._patch_record(file_path, num_line, len(record), 0, record)
+
+    def _patch_record(
+        self,
+        file_path: str,
+        num_line: int,
+        size: int,
+        field_offset: int,
+        data: bytes,
+    ):
+        """
+        Перезаписывает `data` по смещению `field_offset` внутри записи
+        размером `size` байт.
+        """
+        buffered = self._buffered_position(file_path, num_line, size)
+        if buffered is not None:
+            buffer = self._bulk_buffers[file_path]
+            record = buffer[buffered]
+            buffer[buffered] = (
+                record[:field_offset]
+                + data
+                + record[field_offset + len(data):]
+            )
+            return
+
+        offset = (num_line - 1) * size + field_offset
+        mm = self._mmap(file_path, num_line * size)
+        mm[offset:offset + len(data)] = data
+
+    def _patch_field(
+        self,
+        index: str,
+        cls: Type[BaseModel],
+        field_offset: int,
+        data: bytes,
+    ) -> int:
+        """
+        Перезаписывает байты одного поля объекта, не трогая остальную
+        запись, и возвращает номер строки объекта.
+        """
+        num_line = self.get_num_line(index, cls)
+        self._patch_record(
+            self._get_model_db_path(cls),
+            num_line,
+            cls._FMT.size,
+            field_offset,
+            data,
+        )
+        return num_line
 
     def _get_model_db_path(
         self, instance_or_cls: Union[BaseModel, Type[BaseModel]]
@@ -210,9 +594,7 @@ class BaseService:
             if isinstance(instance_or_cls, type)
             else instance_or_cls.__class__
         )
-        return os.path.join(
-            self.root_directory_path, f"{p.plural(cls.__name__).lower()}.txt"
-        )
+        return _paths_for(cls, self.root_directory_path)[0]
 
     def _get_index_db_path(
         self, instance_or_cls: Union[BaseModel, Type[BaseModel]]
@@ -223,7 +605,4 @@ class BaseService:
             if isinstance(instance_or_cls, type)
             else instance_or_cls.__class__
         )
-        return os.path.join(
-            self.root_directory_path,
-            f"{p.plural(cls.__name__).lower()}_index.txt",
-        )
+        return _paths_for(cls, self.root_directory_path)[1]
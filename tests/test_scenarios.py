@@ -1,8 +1,9 @@
-from datetime import datetime
+from datetime import UTC, datetime, timedelta, timezone
 from decimal import Decimal
 
 import pytest
 
+import utils
 from bibip_car_service import CarService
 from models import Car, CarFullInfo, CarStatus, Model, ModelSaleStats, Sale
 
@@ -133,6 +134,24 @@ class TestCarServiceScenarios:
         assert res is not None
         assert res.status == CarStatus.sold
 
+    def test_sell_car_patches_status_only(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, car_data, model_data)
+
+        sale = Sale(
+            sales_number="20240903#JM1BL1M58C1614725",
+            car_vin="JM1BL1M58C1614725",
+            sales_date=datetime(2024, 9, 3),
+            cost=Decimal("2399.99"),
+        )
+        car = service.sell_car(sale)
+
+        sold = car_data[4].model_copy(update={"status": CarStatus.sold})
+        assert car == sold
+        with open(service._get_model_db_path(Car), "rb") as file:
+            assert file.read()[4 * Car._FMT.size:5 * Car._FMT.size] == sold.to_bytes()
+
     def test_list_cars_by_available_status(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
         service = CarService(tmpdir)
 
@@ -207,6 +226,35 @@ class TestCarServiceScenarios:
         assert service.get_car_info("UPDGM4A77D5316538") == full_info_no_sale
         assert service.get_car_info("KNAGM4A77D5316538") is None
 
+    def test_update_vin_after_reopen(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, car_data[:2], model_data)
+        service.add_car(car_data[2].model_copy(update={"vin": car_data[1].vin}))
+        service.add_car(car_data[3])
+        service.add_car(car_data[3].model_copy(update={"price": Decimal("1")}))
+
+        service.update_vin(car_data[0].vin, car_data[1].vin)
+        service.update_vin(car_data[3].vin, "UPDGM4A77D5316538")
+
+        expected = {
+            car_data[0].vin: None,
+            car_data[1].vin: car_data[0].model_copy(update={"vin": car_data[1].vin}),
+            car_data[3].vin: None,
+            "UPDGM4A77D5316538": car_data[3].model_copy(
+                update={"vin": "UPDGM4A77D5316538", "price": Decimal("1")}
+            ),
+        }
+        for vin, car in expected.items():
+            assert service.get(vin, Car) == car
+        service.close()
+
+        for sorted_index in (False, True):
+            reopened = CarService(tmpdir, sorted_index=sorted_index)
+            for vin, car in expected.items():
+                assert reopened.get(vin, Car) == car
+            reopened.close()
+
     def test_delete_sale(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
         service = CarService(tmpdir)
 
@@ -290,3 +338,224 @@ class TestCarServiceScenarios:
             ModelSaleStats(car_model_name="Pathfinder", brand="Nissan", sales_number=1),
         ]
         assert service.top_models_by_sales() == top_3_models
+
+    def test_bulk_fill(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        with service.bulk():
+            self._fill_initial_data(service, car_data, model_data)
+
+        available_cars = [car for car in car_data if car.status == CarStatus.available]
+
+        assert service.get_cars(CarStatus.available) == available_cars
+        assert service.get_car_info("KNAGM4A77D5316538").car_model_name == "Optima"
+
+    def test_bulk_update_buffered(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        with service.bulk():
+            self._fill_initial_data(service, [], model_data)
+            service.add_car(car_data[0])
+            service.update(car_data[0], {"price": Decimal("1500")}, Car)
+            service.update_vin(car_data[0].vin, "UPDGM4A77D5316538")
+            service.add_car(car_data[1])
+
+        assert len(service.get_list(Car)) == 2
+        assert service.get("UPDGM4A77D5316538", Car).price == Decimal("1500")
+        assert service.get(car_data[0].vin, Car) is None
+        assert service.get(car_data[1].vin, Car) == car_data[1]
+
+    def test_bulk_rollback(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, car_data[:-1], model_data)
+
+        with pytest.raises(RuntimeError):
+            with service.bulk():
+                service.add_car(car_data[-1])
+                service.update_vin("KNAGM4A77D5316538", "UPDGM4A77D5316538")
+                raise RuntimeError("rollback")
+
+        # Добавления отброшены, изменения уже сохраненных объектов остались.
+        assert len(service.get_list(Car)) == len(car_data) - 1
+        assert service.get(car_data[-1].vin, Car) is None
+        assert service.get("UPDGM4A77D5316538", Car) is not None
+        assert service.get("KNAGM4A77D5316538", Car) is None
+
+        service.add_car(car_data[-1])
+        assert service.get(car_data[-1].vin, Car) == car_data[-1]
+
+    def test_compact_inside_bulk(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        with service.bulk():
+            self._fill_initial_data(service, car_data[:1], model_data)
+            with pytest.raises(RuntimeError):
+                service.compact()
+            service.add_car(car_data[1])
+
+        service.compact()
+
+        assert service.get(car_data[0].vin, Car) == car_data[0]
+        assert service.get(car_data[1].vin, Car) == car_data[1]
+
+    def test_two_services_append(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        first = CarService(tmpdir)
+        second = CarService(tmpdir)
+
+        first.add_car(car_data[0])
+        second.add_car(car_data[1])
+        first.add_car(car_data[2])
+
+        assert first.get(car_data[2].vin, Car) == car_data[2]
+        assert second.get(car_data[1].vin, Car) == car_data[1]
+
+        reopened = CarService(tmpdir)
+        for car in car_data[:3]:
+            assert reopened.get(car.vin, Car) == car
+
+    def test_sorted_index(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir, sorted_index=True)
+
+        self._fill_initial_data(service, car_data, model_data)
+
+        assert service.get_car_info("KNAGM4A77D5316538").car_model_name == "Optima"
+
+        service.update_vin("KNAGM4A77D5316538", "UPDGM4A77D5316538")
+        service.add_car(
+            Car(
+                vin="KNAGM4A77D5316538",
+                model=2,
+                price=Decimal("1000"),
+                date_start=datetime(2024, 9, 1),
+                status=CarStatus.available,
+            )
+        )
+
+        assert service.get_car_info("UPDGM4A77D5316538").car_model_name == "Optima"
+        assert service.get_car_info("KNAGM4A77D5316538").car_model_name == "Sorento"
+
+        service.compact()
+
+        assert service.get_car_info("UPDGM4A77D5316538").car_model_name == "Optima"
+        assert service.get_car_info("KNAGM4A77D5316538").car_model_name == "Sorento"
+        assert service.get_car_info("5N1CR2MN9EC641864").car_model_name == "Pathfinder"
+        assert service.get_car_info("AAAAAAAAAAAAAAAAA") is None
+
+    def test_sorted_index_duplicate_keys(self):
+        data = b"".join([
+            utils.pack_index("B", 1),
+            utils.pack_index("A", 2),
+            utils.pack_index("B", 0),
+            utils.pack_index("C", 3),
+            utils.pack_index("A", 4),
+            utils.pack_index("B", 5),
+            utils.pack_index("C", 0),
+        ])
+        index = utils.SortedIndex(data)
+
+        assert index["A"] == (4, 5)
+        assert index["B"] == (5, 6)
+        assert "C" not in index
+
+        index["A"] = (6, 8)
+        assert index.pop("A") == (6, 8)
+        assert "A" not in index
+
+    @pytest.mark.parametrize("sorted_index", [False, True])
+    def test_resell_after_compact(self, tmpdir: str, model_data: list[Model], sorted_index: bool):
+        service = CarService(tmpdir, sorted_index=sorted_index)
+
+        # 254 продажи, чтобы номера строк повторной продажи перешли через 256.
+        cars = [
+            Car(
+                vin=f"V{i:016d}",
+                model=1,
+                price=Decimal("1000"),
+                date_start=datetime(2024, 1, 1),
+                status=CarStatus.available,
+            )
+            for i in range(255)
+        ]
+        with service.bulk():
+            self._fill_initial_data(service, cars, model_data)
+            for car in cars[1:]:
+                service.sell_car(
+                    Sale(
+                        sales_number=f"20240903#{car.vin}",
+                        car_vin=car.vin,
+                        sales_date=datetime(2024, 9, 3),
+                        cost=Decimal("1000"),
+                    )
+                )
+
+        vin = cars[0].vin
+        sale = Sale(
+            sales_number=f"20240903#{vin}",
+            car_vin=vin,
+            sales_date=datetime(2024, 9, 3),
+            cost=Decimal("1000"),
+        )
+        service.sell_car(sale)
+        service.revert_sale(sale.sales_number)
+        resale = sale.model_copy(update={"sales_date": datetime(2024, 9, 4)})
+        service.sell_car(resale)
+
+        assert service.get(vin, Sale) == resale
+
+        service.compact()
+
+        assert service.get(vin, Sale) == resale
+        assert service.get_car_info(vin).sales_date == resale.sales_date
+
+    def test_aware_dates_stored_as_utc(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, [], model_data)
+        car = car_data[0].model_copy(
+            update={"date_start": datetime(2024, 2, 8, 3, tzinfo=timezone(timedelta(hours=3)))}
+        )
+        service.add_car(car)
+
+        assert service.get(car.vin, Car).date_start == datetime(2024, 2, 8, 0)
+        assert service.get(car.vin, Car).date_start == car.date_start.astimezone(UTC).replace(tzinfo=None)
+
+    def test_invalid_values_rejected(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        with pytest.raises(ValueError):
+            service.add_model(Model(id=6, name="X" * 65, brand="Lada"))
+        with pytest.raises(ValueError):
+            service.add_car(car_data[0].model_copy(update={"vin": "KNAGM4A77D5316538X"}))
+        with pytest.raises(ValueError):
+            service.add_car(car_data[0].model_copy(update={"price": Decimal("2000.001")}))
+
+        assert service.get_list(Model) == []
+        assert service.get_list(Car) == []
+
+    def test_delete_persists(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, car_data, model_data)
+        service.delete("KNAGM4A77D5316538", Car)
+
+        assert service.get("KNAGM4A77D5316538", Car) is None
+        service.close()
+
+        service = CarService(tmpdir)
+        assert service.get("KNAGM4A77D5316538", Car) is None
+        assert service.get_car_info("KNAGM4A77D5316538") is None
+        assert all(car.vin != "KNAGM4A77D5316538" for car in service.get_cars(CarStatus.available))
+
+    def test_get_returns_fresh_objects(self, tmpdir: str, car_data: list[Car], model_data: list[Model]):
+        service = CarService(tmpdir)
+
+        self._fill_initial_data(service, car_data, model_data)
+
+        car = service.get("KNAGM4A77D5316538", Car)
+        car.status = CarStatus.sold
+        assert service.get("KNAGM4A77D5316538", Car) == car_data[0]
+        assert service.get("KNAGM4A77D5316538", Car) is not service.get("KNAGM4A77D5316538", Car)
+
+        service.update("KNAGM4A77D5316538", {"price": Decimal("1500")}, Car)
+        assert service.get("KNAGM4A77D5316538", Car).price == Decimal("1500")